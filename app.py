@@ -1,23 +1,52 @@
 import asyncio
 import calendar
+import concurrent.futures
+import contextlib
+import email.utils
 import hashlib
+import importlib.util
 import re
 import os
 import sys
 import sqlite3
 import threading
 import time
-from datetime import datetime, timedelta, timezone
+import weakref
+from datetime import datetime, timezone
 import io
 import json
 import xml.etree.ElementTree as ET
 import urllib.request
-from urllib.parse import urljoin
-from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+from html import escape as html_escape, unescape as html_unescape
 
 import aiohttp
-import feedparser
+try:
+    import httpx  # optional: HTTP/2 feed polling (pip install "httpx[http2]")
+except ImportError:
+    httpx = None
+try:
+    import orjson  # optional: faster JSON responses (pip install orjson)
+except ImportError:
+    orjson = None
 from flask import Flask, g, jsonify, request, send_from_directory, Response
+from flask.json.provider import DefaultJSONProvider
+
+from fastpath import canonicalize_url, parse_rfc822
+from opml_parser import _parse_opml
+
+# feedparser is heavy (~40 ms, dozens of submodules) and only needed once feeds are
+# parsed (HTML sanitizing, odd dates, the broken-XML fallback), so load it on first use
+_feedparser_mod = None
+
+def _feedparser():
+    global _feedparser_mod
+    if _feedparser_mod is None:
+        import feedparser
+        import feedparser.datetimes
+        import feedparser.sanitizer
+        _feedparser_mod = feedparser
+    return _feedparser_mod
 
 # -----------------------
 # Config
@@ -38,6 +67,8 @@ APP_VERSION = "0.4.15"
 USER_AGENT = os.environ.get("RSS_UA", f"LocalRSSReader/{APP_VERSION} (+Windows; local)")
 MAX_CONCURRENCY = int(os.environ.get("RSS_CONCURRENCY", "40"))
 LIMIT_PER_HOST = int(os.environ.get("RSS_LIMIT_PER_HOST", "4"))
+# Feed polling client: "httpx" (HTTP/2, used when httpx[http2] is installed) or "aiohttp"
+HTTP_CLIENT = os.environ.get("RSS_HTTP_CLIENT", "httpx").strip().lower()
 
 
 def _scan_databases() -> list[str]:
@@ -59,9 +90,8 @@ def _scan_databases() -> list[str]:
 
 
 def _load_last_db_abs() -> str | None:
+    # Runs on every connect: open directly (a missing file lands in the except)
     try:
-        if not os.path.exists(LAST_DB_FILE):
-            return None
         with open(LAST_DB_FILE, "r", encoding="utf-8") as f:
             data = json.load(f)
         p = (data or {}).get("last_db_abs")
@@ -119,28 +149,150 @@ INTERVAL_LOW = int(os.environ.get("RSS_INTERVAL_LOW", str(20 * 60)))
 INTERVAL_MED = int(os.environ.get("RSS_INTERVAL_MED", str(60 * 60)))
 INTERVAL_HIGH = int(os.environ.get("RSS_INTERVAL_HIGH", str(2 * 60 * 60)))
 
+_RE_DBNAME = re.compile(r"[^A-Za-z0-9._-]+")
+_XML_ESC = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"})
+
 # -----------------------
 # App
 # -----------------------
 app = Flask(__name__, static_folder="static")
 
+if orjson is not None:
+    class OrjsonProvider(DefaultJSONProvider):
+        # Every jsonify() goes through orjson; payloads are plain dicts/lists with str keys
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = OrjsonProvider(app)
+
+def json_response(obj) -> Response:
+    """JSON body for large payloads; orjson emits bytes directly, skipping the str step."""
+    if orjson is not None:
+        return Response(orjson.dumps(obj), mimetype="application/json")
+    return Response(json.dumps(obj, separators=(",", ":")), mimetype="application/json")
+
 def now_ts() -> int:
     return int(time.time())
 
 def cutoff_ts(days: int = RETENTION_DAYS) -> int:
-    return int((datetime.now(timezone.utc) - timedelta(days=days)).timestamp())
+    # Both sides are epoch seconds; no datetime/tz math needed
+    return now_ts() - days * 86400
 
-# Serialize *all* write operations to avoid "database is locked"
+# Serializes update runs (scheduler, manual jobs, single-feed refresh) and DB switching.
+# Request handlers don't take it: they use BEGIN IMMEDIATE and SQLite's busy timeout.
 DB_WRITE_LOCK = threading.Lock()
 
-def connect_db() -> sqlite3.Connection:
+# DB files already switched to WAL (journal_mode is persistent, so once per file)
+_pragmas_set: set[str] = set()
+
+# Row counts for /api/stats, kept current by triggers so every writer (handlers,
+# updater, imports) maintains them. 'unread' counts all unread rows; api_stats
+# subtracts the few that have fallen out of the retention window.
+_COUNTERS_SQL = """
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_feeds_ins AFTER INSERT ON feeds BEGIN
+  UPDATE counters SET value = value + 1 WHERE name = 'feeds';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_feeds_del AFTER DELETE ON feeds BEGIN
+  UPDATE counters SET value = value - 1 WHERE name = 'feeds';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_entries_ins AFTER INSERT ON entries BEGIN
+  UPDATE counters SET value = value + (NEW.read_at IS NULL) WHERE name = 'unread';
+  UPDATE counters SET value = value + (COALESCE(NEW.bookmarked, 0) = 1) WHERE name = 'bookmarked';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_entries_del AFTER DELETE ON entries BEGIN
+  UPDATE counters SET value = value - (OLD.read_at IS NULL) WHERE name = 'unread';
+  UPDATE counters SET value = value - (COALESCE(OLD.bookmarked, 0) = 1) WHERE name = 'bookmarked';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_entries_upd AFTER UPDATE OF read_at, bookmarked ON entries BEGIN
+  UPDATE counters SET value = value + (NEW.read_at IS NULL) - (OLD.read_at IS NULL) WHERE name = 'unread';
+  UPDATE counters SET value = value + (COALESCE(NEW.bookmarked, 0) = 1) - (COALESCE(OLD.bookmarked, 0) = 1)
+    WHERE name = 'bookmarked';
+END;
+
+INSERT OR IGNORE INTO counters(name, value) SELECT 'feeds', COUNT(*) FROM feeds;
+INSERT OR IGNORE INTO counters(name, value) SELECT 'unread', COUNT(*) FROM entries WHERE read_at IS NULL;
+INSERT OR IGNORE INTO counters(name, value) SELECT 'bookmarked', COUNT(*) FROM entries WHERE bookmarked = 1;
+"""
+
+def _ensure_counters(con: sqlite3.Connection) -> None:
+    """Create and seed the counters table + triggers once (atomically) per DB file."""
+    if con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='counters'").fetchone():
+        return
+    try:
+        con.executescript("BEGIN IMMEDIATE;" + _COUNTERS_SQL + "COMMIT;")
+    except Exception:
+        if con.in_transaction:
+            con.execute("ROLLBACK")
+        raise
+
+# Deleting a feed takes its entries with it. A trigger rather than ON DELETE CASCADE:
+# it needs no per-connection foreign_keys pragma and no entries rebuild on old files.
+SQL_FEED_CASCADE = """
+CREATE TRIGGER IF NOT EXISTS trg_feeds_del_entries AFTER DELETE ON feeds BEGIN
+  DELETE FROM entries WHERE feed_id = OLD.id;
+END"""
+
+def _migrate_db(con: sqlite3.Connection) -> None:
+    """Add columns/tables introduced after a DB file was created (no-op on new/current files)."""
+    for ddl in (
+        "ALTER TABLE feeds ADD COLUMN body_sha TEXT",
+        SQL_FEED_CASCADE,
+    ):
+        try:
+            con.execute(ddl)
+        except sqlite3.OperationalError:
+            # duplicate column, or the tables don't exist yet (init_db creates them)
+            pass
+    try:
+        _ensure_counters(con)
+    except sqlite3.OperationalError:
+        # feeds/entries don't exist yet; init_db creates the counters with them
+        pass
+
+def _open_db(db_abs: str, read_only: bool = False, check_same_thread: bool = True) -> sqlite3.Connection:
+    # isolation_level=None: no implicit transactions; writers use BEGIN IMMEDIATE/COMMIT.
+    # The connect timeout doubles as SQLite's busy_timeout.
+    if read_only:
+        target, uri = "file:" + urllib.request.pathname2url(db_abs) + "?mode=ro", True
+    else:
+        target, uri = db_abs, False
+    con = sqlite3.connect(
+        target, timeout=SQLITE_TIMEOUT, isolation_level=None, uri=uri, check_same_thread=check_same_thread
+    )
+    try:
+        if not read_only and db_abs not in _pragmas_set:
+            # WAL lets readers run alongside the updater; some filesystems refuse it
+            mode = con.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if str(mode).lower() != "wal":
+                print(f"[WARN] SQLite WAL unavailable for '{db_abs}' (journal_mode={mode}); readers may block on writes.", file=sys.stderr)
+            _migrate_db(con)
+            # Refresh planner stats where stale (Gunicorn never runs init_db's ANALYZE)
+            con.execute("PRAGMA optimize")
+            _pragmas_set.add(db_abs)
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute("PRAGMA temp_store=MEMORY")
+        con.execute("PRAGMA mmap_size=268435456")
+        con.execute("PRAGMA cache_size=-65536")
+        if read_only:
+            # Surface open errors now (e.g. WAL in a read-only directory), not mid-request
+            con.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+    except Exception:
+        con.close()
+        raise
+    con.row_factory = sqlite3.Row
+    return con
+
+def _refresh_db_abs() -> str:
     """
-    Connect to SQLite database.
-    - Re-reads the persisted DB selection on every connect so all Gunicorn
+    Path of the DB to open.
+    - Re-reads the persisted DB selection on every call so all Gunicorn
       workers stay in sync when the user switches databases.
     - If RSS_DB points to a path whose directory doesn't exist, create it.
-    - If the path cannot be opened, fall back to a local rss.db next to app.py,
-      so the app stays up (with an empty/new DB) instead of crashing.
     """
     global ACTIVE_DB_PATH, DB_PATH, DB_PATH_ABS
 
@@ -158,20 +310,28 @@ def connect_db() -> sqlite3.Connection:
             os.makedirs(parent, exist_ok=True)
         except Exception as e:
             print(f"[WARN] Could not create DB directory '{parent}': {e}", file=sys.stderr)
+    return db_abs
 
+def connect_db(check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Connect to SQLite database (see _refresh_db_abs for which one).
+    If the path cannot be opened, fall back to a local rss.db next to app.py,
+    so the app stays up (with an empty/new DB) instead of crashing.
+    """
+    global ACTIVE_DB_PATH
+
+    db_abs = _refresh_db_abs()
     try:
-        con = sqlite3.connect(db_abs, timeout=SQLITE_TIMEOUT)
+        con = _open_db(db_abs, check_same_thread=check_same_thread)
         ACTIVE_DB_PATH = db_abs
         _save_last_db_abs(ACTIVE_DB_PATH)
-        con.row_factory = sqlite3.Row
         return con
     except Exception as e:
         fallback_abs = os.path.abspath(os.path.join(os.path.dirname(__file__), "rss.db"))
         try:
-            con = sqlite3.connect(fallback_abs, timeout=SQLITE_TIMEOUT)
+            con = _open_db(fallback_abs, check_same_thread=check_same_thread)
             ACTIVE_DB_PATH = fallback_abs
             _save_last_db_abs(ACTIVE_DB_PATH)
-            con.row_factory = sqlite3.Row
             print(f"[WARN] Could not open DB at '{db_abs}' ({e}). Falling back to '{fallback_abs}'.", file=sys.stderr)
             return con
         except Exception as e2:
@@ -179,6 +339,107 @@ def connect_db() -> sqlite3.Connection:
                 f"Unable to open database file. Tried '{db_abs}' and fallback '{fallback_abs}'. Error: {e2}"
             ) from e2
 
+# Long-lived connections for request handlers: one shared writer and a small pool of
+# read-only connections, reopened when the active DB changes. Keeping them open skips
+# sqlite3_open/schema parsing per request and keeps the statement cache warm. The pool
+# isn't per-thread: app.run(threaded=True) starts a new thread for every request.
+# The background updater still opens its own connections.
+WRITER_CONN: sqlite3.Connection | None = None
+_writer_db_abs: str | None = None
+# Guards WRITER_CONN only (held for a handler's statements, not for update runs)
+_WRITER_LOCK = threading.Lock()
+READ_POOL_SIZE = 4
+_read_pool: list[tuple[str, sqlite3.Connection]] = []
+_read_pool_lock = threading.Lock()
+
+def writer_db() -> sqlite3.Connection:
+    """Shared write connection. Caller must hold _WRITER_LOCK; never close it."""
+    global WRITER_CONN, _writer_db_abs
+    db_abs = _refresh_db_abs()
+    if WRITER_CONN is None or _writer_db_abs != db_abs:
+        if WRITER_CONN is not None:
+            WRITER_CONN.close()
+        WRITER_CONN = connect_db(check_same_thread=False)
+        _writer_db_abs = db_abs
+    return WRITER_CONN
+
+@contextlib.contextmanager
+def writer():
+    """
+    Shared write connection for a request handler. `with db` rolls back on error,
+    so the connection never keeps a transaction open after the block.
+    """
+    with _WRITER_LOCK:
+        db = writer_db()
+        with db:
+            yield db
+
+def begin_immediate(db: sqlite3.Connection, retries: int = 3) -> None:
+    """
+    Take SQLite's write lock up front. The busy timeout already waits in C; if another
+    writer still holds it past that, retry a few times with exponential backoff.
+    """
+    for attempt in range(retries + 1):
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) or attempt == retries:
+                raise
+            time.sleep(0.05 * 2 ** attempt)
+
+def _acquire_reader() -> tuple[str, sqlite3.Connection]:
+    """(db_abs, connection) from the pool, or a new read-only connection to the active DB."""
+    db_abs = _refresh_db_abs()
+    item = None
+    stale = []
+    with _read_pool_lock:
+        while _read_pool:
+            cand = _read_pool.pop()
+            if cand[0] == db_abs:
+                item = cand
+                break
+            stale.append(cand[1])
+    for con in stale:
+        con.close()
+    if item is None:
+        try:
+            con = _open_db(db_abs, read_only=True, check_same_thread=False)
+        except sqlite3.OperationalError:
+            # File doesn't exist yet (or can't be opened): create it / fall back as usual
+            con = connect_db(check_same_thread=False)
+        item = (db_abs, con)
+    return item
+
+def _release_reader(item: tuple[str, sqlite3.Connection]) -> None:
+    with _read_pool_lock:
+        if len(_read_pool) < READ_POOL_SIZE:
+            _read_pool.append(item)
+            return
+    item[1].close()
+
+@contextlib.contextmanager
+def reader():
+    """Pooled read-only connection for the length of the block (e.g. a streamed body)."""
+    item = _acquire_reader()
+    try:
+        yield item[1]
+    finally:
+        _release_reader(item)
+
+def read_db() -> sqlite3.Connection:
+    """Read-only connection for this request, back to the pool at teardown; never close it."""
+    item = g.get("_reader")
+    if item is None:
+        item = g._reader = _acquire_reader()
+    return item[1]
+
+@app.teardown_appcontext
+def _release_read_db(exc):
+    item = g.pop("_reader", None)
+    if item is not None:
+        _release_reader(item)
+
 
 def init_db():
     con = connect_db()
@@ -193,7 +454,8 @@ def init_db():
       fail_count INTEGER DEFAULT 0,
       next_fetch INTEGER DEFAULT 0,
       month_count INTEGER DEFAULT 0,
-      last_ok INTEGER DEFAULT 0
+      last_ok INTEGER DEFAULT 0,
+      body_sha TEXT
     );
 
     CREATE TABLE IF NOT EXISTS entries (
@@ -211,17 +473,29 @@ def init_db():
       FOREIGN KEY(feed_id) REFERENCES feeds(id)
     );
 
-    CREATE INDEX IF NOT EXISTS idx_entries_unread ON entries(read_at);
-    CREATE INDEX IF NOT EXISTS idx_entries_bookmarked ON entries(bookmarked);
+    -- Partial indexes matching the /api/items and /api/stats filters
+    DROP INDEX IF EXISTS idx_entries_unread;
+    DROP INDEX IF EXISTS idx_entries_bookmarked;
+    CREATE INDEX IF NOT EXISTS idx_entries_unread_pub ON entries(published DESC) WHERE read_at IS NULL;
+    CREATE INDEX IF NOT EXISTS idx_entries_bm_pub ON entries(published DESC) WHERE bookmarked = 1;
     CREATE INDEX IF NOT EXISTS idx_entries_feed_pub ON entries(feed_id, published);
-    """)
+    -- Retention purge after each update run (published < cutoff AND bookmarked = 0)
+    CREATE INDEX IF NOT EXISTS idx_entries_purge ON entries(published) WHERE bookmarked = 0;
+
+    ANALYZE;
+    """ + SQL_FEED_CASCADE + ";")
     con.commit()
+    _ensure_counters(con)
     con.close()
 
+def _valid_http_url(u: str) -> bool:
+    # Case-insensitive "http://" / "https://" prefix check without the regex engine
+    return u[:8].lower().startswith(("http://", "https://"))
+
 def _sanitize_db_name(name: str) -> str:
     # Keep only a conservative set of characters for filenames
     name = (name or "").strip()
-    name = re.sub(r"[^A-Za-z0-9._-]+", "_", name)
+    name = _RE_DBNAME.sub("_", name)
     if not name:
         return ""
     if not name.lower().endswith(".db"):
@@ -229,51 +503,54 @@ def _sanitize_db_name(name: str) -> str:
     return name
 
 
+# XML declaration up front, or an RSS / RDF / namespaced Atom root, within the sniff window
+_FEED_SNIFF_RE = re.compile(rb"\A\s*<\?xml|<(?:rss|rdf:RDF)\b|<feed\b[^>]*\bxmlns", re.I)
+FEED_SNIFF_BYTES = 4096
+
+
 def _looks_like_feed(content_type: str | None, body: bytes) -> bool:
     """Best-effort check: does this response look like RSS/Atom XML?"""
     ct = (content_type or "").lower()
     if any(t in ct for t in ("application/rss+xml", "application/atom+xml", "application/xml", "text/xml")):
         return True
-    # Sniff body
-    head = body[:4096].lstrip()
-    # XML declaration or feed tags
-    if head.startswith(b"<?xml"):
-        return True
-    lower = head.lower()
-    return (b"<rss" in lower) or (b"<feed" in lower and b"xmlns" in lower)
+    # Sniff the start of the body in place (endpos avoids slicing/lowercasing a copy)
+    return _FEED_SNIFF_RE.search(body, 0, FEED_SNIFF_BYTES) is not None
 
 
-class _HeadLinkFinder(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.in_head = False
-        self.candidates: list[str] = []
+# <link rel="alternate" type="...rss/atom/xml..." href="..."> discovery inside <head>
+_RE_HEAD = re.compile(rb"<head\b[^>]*>(.*?)(?:</head>|$)", re.I | re.S)
+_RE_LINK = re.compile(rb"<link\b[^>]*>", re.I)
+_RE_ATTR = re.compile(rb"""([A-Za-z_:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+HEAD_SCAN_BYTES = 65536
 
-    def handle_starttag(self, tag, attrs):
-        if tag.lower() == "head":
-            self.in_head = True
-            return
-        if not self.in_head:
-            return
-        if tag.lower() != "link":
-            return
-        d = {k.lower(): (v or "") for (k, v) in attrs}
-        rel = d.get("rel", "").lower()
-        typ = d.get("type", "").lower()
-        href = d.get("href", "")
-        if not href:
-            return
-        if "alternate" not in rel:
-            return
-        if "rss" in typ or "atom" in typ or "xml" in typ:
-            self.candidates.append(href)
 
-    def handle_endtag(self, tag):
-        if tag.lower() == "head":
-            self.in_head = False
+def _head_feed_links(body: bytes) -> list[str]:
+    """Return alternate RSS/Atom hrefs declared in the page's <head>, in document order."""
+    m = _RE_HEAD.search(body, 0, HEAD_SCAN_BYTES)
+    if not m:
+        return []
+    candidates = []
+    for link in _RE_LINK.finditer(m.group(1)):
+        attrs = {k.lower(): (v1 or v2 or v3) for (k, v1, v2, v3) in _RE_ATTR.findall(link.group(0))}
+        if b"alternate" not in attrs.get(b"rel", b"").lower():
+            continue
+        typ = attrs.get(b"type", b"").lower()
+        if b"rss" not in typ and b"atom" not in typ and b"xml" not in typ:
+            continue
+        href = html_unescape(attrs.get(b"href", b"").decode("utf-8", "ignore")).strip()
+        if href:
+            candidates.append(href)
+    return candidates
 
 
-def _fetch_url_bytes(url: str, timeout: int = 12) -> tuple[bytes, str | None]:
+FETCH_MAX_BYTES = 10 * 1024 * 1024  # hard cap for interactive fetches (feed add/discovery)
+
+
+def _fetch_url_bytes(url: str, timeout: int = 12) -> tuple[bytearray, str | None]:
+    """
+    GET url into a single buffer (pre-sized from Content-Length, filled with readinto)
+    and return it with the Content-Type. Raises ValueError past FETCH_MAX_BYTES.
+    """
     req = urllib.request.Request(
         url,
         headers={
@@ -282,10 +559,31 @@ def _fetch_url_bytes(url: str, timeout: int = 12) -> tuple[bytes, str | None]:
         },
         method="GET",
     )
+    too_big = f"Response is larger than {FETCH_MAX_BYTES // (1024 * 1024)} MiB."
     with urllib.request.urlopen(req, timeout=timeout) as resp:
         ct = resp.headers.get("Content-Type")
-        body = resp.read()
-        return body, ct
+        try:
+            size = int(resp.headers.get("Content-Length") or 0)
+        except ValueError:
+            size = 0
+        if size > FETCH_MAX_BYTES:
+            raise ValueError(too_big)
+        buf = bytearray(size or 65536)
+        n = 0
+        while not (size and n >= size):
+            if n == len(buf):
+                if n >= FETCH_MAX_BYTES:
+                    if resp.read(1):
+                        raise ValueError(too_big)
+                    break
+                buf.extend(bytes(min(n, FETCH_MAX_BYTES - n)))
+            with memoryview(buf) as mv, mv[n:] as tail:
+                got = resp.readinto(tail)
+            if not got:
+                break
+            n += got
+        del buf[n:]
+        return buf, ct
 
 
 def discover_feed_url(input_url: str) -> tuple[str, str]:
@@ -293,93 +591,99 @@ def discover_feed_url(input_url: str) -> tuple[str, str]:
     url = (input_url or "").strip()
     if not url:
         raise ValueError("URL is required")
-    if not re.match(r"^https?://", url, re.I):
+    if not _valid_http_url(url):
         raise ValueError("URL must start with http:// or https://")
 
     body, ct = _fetch_url_bytes(url)
     if _looks_like_feed(ct, body):
         return url, "direct"
 
-    # Parse HTML head for RSS/Atom link
-    try:
-        text = body.decode("utf-8", errors="ignore")
-    except Exception:
-        text = ""
-    parser = _HeadLinkFinder()
-    parser.feed(text)
-    if not parser.candidates:
+    # Scan the HTML head for an RSS/Atom link
+    candidates = _head_feed_links(body)
+    if not candidates:
         raise ValueError("No RSS/Atom link tag found in the page header.")
 
     # Choose first candidate (site may expose multiple)
-    feed_url = urljoin(url, parser.candidates[0])
+    feed_url = urljoin(url, candidates[0])
     return feed_url, "discovered"
 
-def _parse_opml(xml_bytes: bytes):
-    """Return list of (url, title) from an OPML file."""
-    try:
-        root = ET.fromstring(xml_bytes)
-    except Exception as e:
-        raise ValueError(f"Invalid OPML/XML: {e}")
-
-    pairs = []
-    seen = set()
-    for el in root.findall(".//outline"):
-        url = el.attrib.get("xmlUrl") or el.attrib.get("xmlurl") or el.attrib.get("url")
-        if not url:
-            continue
-        url = url.strip()
-        if not url or url in seen:
-            continue
-        title = (el.attrib.get("title") or el.attrib.get("text") or "").strip() or None
-        pairs.append((url, title))
-        seen.add(url)
+# Recent OPML uploads by content hash, so a retried or double-submitted import
+# skips the parse. Small: uploads are a few hundred KB at most.
+OPML_CACHE_SIZE = 16
+_OPML_CACHE: dict[str, tuple] = {}
+_OPML_CACHE_LOCK = threading.Lock()
+
+def _parse_opml_cached(xml_bytes: bytes) -> tuple:
+    """_parse_opml keyed by blake2b of the upload; least recently used entry evicted."""
+    key = hashlib.blake2b(xml_bytes, digest_size=16).hexdigest()
+    with _OPML_CACHE_LOCK:
+        pairs = _OPML_CACHE.pop(key, None)
+        if pairs is not None:
+            _OPML_CACHE[key] = pairs  # re-insert as most recent
+            return pairs
+    pairs = tuple(_parse_opml(xml_bytes))  # ValueError on bad XML is not cached
+    with _OPML_CACHE_LOCK:
+        _OPML_CACHE[key] = pairs
+        while len(_OPML_CACHE) > OPML_CACHE_SIZE:
+            del _OPML_CACHE[next(iter(_OPML_CACHE))]
     return pairs
 
-def _build_opml(feeds):
+def _build_opml_stream(rows):
+    """
+    Yield an OPML document chunk by chunk from (url, title) rows, e.g. a live cursor,
+    so an export never holds the feed list or the document in memory.
+    """
     now_iso = datetime.now().strftime("%a, %d %b %Y %H:%M:%S")
-    parts = []
-    parts.append('<?xml version="1.0" encoding="UTF-8"?>')
-    parts.append('<opml version="2.0">')
-    parts.append('  <head>')
-    parts.append('    <title>LocalRSSReader Feeds</title>')
-    parts.append(f'    <dateCreated>{now_iso}</dateCreated>')
-    parts.append('  </head>')
-    parts.append('  <body>')
-    for f in feeds:
-        url = (f["url"] if isinstance(f, dict) else f[0]) or ""
-        title = (f["title"] if isinstance(f, dict) else (f[1] if len(f) > 1 else None)) or url
+    yield (
+        b'<?xml version="1.0" encoding="UTF-8"?>\n'
+        b'<opml version="2.0">\n'
+        b'  <head>\n'
+        b'    <title>LocalRSSReader Feeds</title>\n'
+        + f'    <dateCreated>{now_iso}</dateCreated>\n'.encode("utf-8")
+        + b'  </head>\n  <body>\n'
+    )
+    for url, title in rows:
+        url = url or ""
         # minimal XML escaping
-        def esc(s): 
-            return (s.replace("&","&amp;").replace("<","&lt;").replace(">","&gt;").replace('"',"&quot;"))
-        parts.append(f'    <outline type="rss" text="{esc(title)}" title="{esc(title)}" xmlUrl="{esc(url)}" />')
-    parts.append('  </body>')
-    parts.append('</opml>')
-    return "\n".join(parts).encode("utf-8")
+        title = (title or url).translate(_XML_ESC)
+        yield f'    <outline type="rss" text="{title}" title="{title}" xmlUrl="{url.translate(_XML_ESC)}" />\n'.encode("utf-8")
+    yield b'  </body>\n</opml>'
 
 
-def get_db():
-    if "db" not in g:
-        g.db = connect_db()
-    return g.db
+@app.before_request
+def _set_request_cutoff():
+    # One retention cutoff per request
+    g.cutoff = cutoff_ts()
 
-@app.teardown_appcontext
-def close_db(_exc):
-    db = g.pop("db", None)
-    if db is not None:
-        db.close()
+def import_feed_pairs(con, pairs) -> tuple[int, int]:
+    """
+    Insert (url, title) pairs in one executemany, ignoring known URLs.
+    Returns (imported, skipped); the caller owns the transaction.
+    """
+    rows = [(u, t or None) for u, t in pairs if u]
+    before = con.execute("SELECT COUNT(*) FROM feeds").fetchone()[0]
+    con.executemany(SQL_IMPORT_FEED, rows)
+    imported = con.execute("SELECT COUNT(*) FROM feeds").fetchone()[0] - before
+    return imported, len(rows) - imported
 
-def ensure_feed(db, url: str):
-    db.execute("INSERT OR IGNORE INTO feeds(url, next_fetch) VALUES(?, ?)", (url, 0))
+def _guid_hash_input(entry) -> bytes:
+    link = entry.get("link", "")
+    title = entry.get("title", "")
+    published = str(entry.get("published", "")) or str(entry.get("updated", ""))
+    return f"{link}\n{title}\n{published}".encode("utf-8", "ignore")
 
 def stable_guid(entry) -> str:
     gid = entry.get("id") or entry.get("guid")
     if gid:
         return str(gid)
-    link = entry.get("link", "")
-    title = entry.get("title", "")
-    published = str(entry.get("published", "")) or str(entry.get("updated", ""))
-    raw = f"{link}\n{title}\n{published}".encode("utf-8", "ignore")
-    return hashlib.sha256(raw).hexdigest()
+    # Dedupe key, not a security boundary: 128-bit blake2b is plenty and cheaper than sha256
+    return hashlib.blake2b(_guid_hash_input(entry), digest_size=16).hexdigest()
+
+def legacy_guid(entry) -> str | None:
+    """The sha256 key stable_guid used to give a guid-less entry; None if it has an id/guid."""
+    if entry.get("id") or entry.get("guid"):
+        return None
+    return hashlib.sha256(_guid_hash_input(entry)).hexdigest()
 
 def safe_struct_time_to_ts(st) -> int:
     """
@@ -422,13 +726,221 @@ def entry_content_html(entry) -> str:
             pass
     return entry.get("summary", "") or ""
 
-def recompute_month_count(db, feed_id: int, cutoff: int):
-    row = db.execute(
-        "SELECT COUNT(*) AS c FROM entries WHERE feed_id=? AND published>=?",
-        (feed_id, cutoff)
-    ).fetchone()
-    c = int(row["c"])
-    db.execute("UPDATE feeds SET month_count=? WHERE id=?", (c, feed_id))
+# Clark-notation tags for the streaming parser (RSS 2.0, RSS 1.0/RDF, Atom)
+_NS_ATOM = "{http://www.w3.org/2005/Atom}"
+_NS_RSS1 = "{http://purl.org/rss/1.0/}"
+_NS_CONTENT = "{http://purl.org/rss/1.0/modules/content/}"
+_NS_DC = "{http://purl.org/dc/elements/1.1/}"
+
+_FEED_TAGS = frozenset(("channel", _NS_RSS1 + "channel", _NS_ATOM + "feed"))
+_ENTRY_TAGS = frozenset(("item", _NS_RSS1 + "item", _NS_ATOM + "entry"))
+_TITLE_TAGS = frozenset(("title", _NS_RSS1 + "title", _NS_ATOM + "title"))
+_ENTRY_FIELDS = {
+    "guid": "id",
+    _NS_ATOM + "id": "id",
+    "title": "title",
+    _NS_RSS1 + "title": "title",
+    _NS_ATOM + "title": "title",
+    "link": "link",
+    _NS_RSS1 + "link": "link",
+    _NS_ATOM + "link": "link",
+    "pubDate": "published",
+    _NS_ATOM + "published": "published",
+    _NS_ATOM + "updated": "updated",
+    _NS_DC + "date": "updated",
+    _NS_CONTENT + "encoded": "content",
+    _NS_ATOM + "content": "content",
+    "description": "summary",
+    _NS_RSS1 + "description": "summary",
+    _NS_ATOM + "summary": "summary",
+}
+
+
+def _element_html(el) -> str:
+    typ = (el.get("type") or "html").lower()
+    if typ == "xhtml" or len(el):
+        # Inline XHTML: drop the namespace so it serializes as plain HTML tags
+        for node in el.iter():
+            if isinstance(node.tag, str) and node.tag[:1] == "{":
+                node.tag = node.tag.split("}", 1)[1]
+        return (el.text or "") + "".join(ET.tostring(c, encoding="unicode") for c in el)
+    text = (el.text or "").strip()
+    if typ == "text":
+        return html_escape(text)
+    return text
+
+
+def parse_feed_date(value: str, max_year: int) -> int | None:
+    """
+    Epoch seconds for an RSS (RFC 822) or Atom/dc (ISO 8601) date string, None if
+    unparseable. Absurd years map to now, as safe_struct_time_to_ts does.
+    """
+    ts = parse_rfc822(value, max_year)  # the usual RSS shape, without building a datetime
+    if ts is not None:
+        return ts
+    try:
+        dt = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            dt = datetime.fromisoformat(value[:-1] + "+00:00" if value[-1:] in ("Z", "z") else value)
+        except ValueError:
+            # Rarer shapes: let feedparser's date handlers have a go
+            st = _feedparser().datetimes._parse_date(value)
+            return safe_struct_time_to_ts(st) if st else None
+    if dt.year < 1971 or dt.year > max_year:
+        return now_ts()
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def _entry_from_element(el, cutoff: int = 0, max_year: int = 9999) -> dict | None:
+    """Build an entry dict from an item/entry element, or None if it predates cutoff."""
+    raw = {}
+    for child in el:
+        key = _ENTRY_FIELDS.get(child.tag)
+        if key is None or key in raw:
+            continue
+        if key == "link":
+            href = child.get("href")
+            if href is None:
+                raw["link"] = (child.text or "").strip()
+            elif child.get("rel", "alternate") == "alternate":
+                raw["link"] = href.strip()
+        elif key in ("content", "summary"):
+            raw[key] = child
+        else:
+            raw[key] = (child.text or "").strip()
+
+    pub_ts = None
+    for key in ("published", "updated"):
+        if raw.get(key):
+            pub_ts = parse_feed_date(raw[key], max_year)
+            if pub_ts is not None:
+                break
+    if pub_ts is None:
+        pub_ts = now_ts()
+    # Check the date before the expensive guid/HTML work
+    if pub_ts < cutoff:
+        return None
+
+    body = raw.get("content")
+    if body is None:
+        body = raw.get("summary")
+    html = _element_html(body) if body is not None else ""
+    return {
+        "guid": stable_guid(raw),
+        "legacy_guid": legacy_guid(raw),
+        "title": raw.get("title") or "",
+        "link": raw.get("link") or None,
+        "published": pub_ts,
+        # feedparser used to sanitize for us; content ends up in innerHTML.
+        "content_html": _feedparser().sanitizer._sanitize_html(html, "utf-8", "text/html") if html else "",
+    }
+
+
+# Feeds are almost always newest-first: once we've seen fresh entries, this many
+# consecutive ones older than the cutoff means the rest of the feed is stale too.
+STALE_STREAK_LIMIT = 5
+
+def parse_feed_stream(payload: bytes, meta: dict, cutoff: int = 0):
+    """
+    Yield entries published at/after cutoff from an RSS/Atom payload, one element
+    at a time. Each entry is a dict with guid/title/link/published/content_html.
+    meta["title"] receives the feed title and meta["entries"] counts the entry
+    elements read (stale ones included). Raises ET.ParseError on bad XML.
+    """
+    stack = []
+    fresh_seen = False
+    stale = 0
+    max_year = datetime.now(timezone.utc).year + 5
+    meta["entries"] = 0
+    for event, el in ET.iterparse(io.BytesIO(payload), events=("start", "end")):
+        if event == "start":
+            stack.append(el)
+            continue
+        stack.pop()
+        if el.tag in _ENTRY_TAGS:
+            meta["entries"] += 1
+            entry = _entry_from_element(el, cutoff, max_year)
+            # Drop the finished entry so memory stays flat on large feeds
+            el.clear()
+            if stack:
+                stack[-1].remove(el)
+            if entry is None:
+                stale += 1
+                if fresh_seen and stale >= STALE_STREAK_LIMIT:
+                    return
+                continue
+            fresh_seen = True
+            stale = 0
+            yield entry
+        elif el.tag in _TITLE_TAGS and stack and stack[-1].tag in _FEED_TAGS:
+            meta["title"] = (el.text or "").strip()
+
+
+def _extract_feed_title(feed_bytes: bytes) -> str | None:
+    """Feed-level title; the streamed scan stops at the first channel/feed <title>."""
+    stack = []
+    try:
+        for event, el in ET.iterparse(io.BytesIO(feed_bytes), events=("start", "end")):
+            if event == "start":
+                stack.append(el)
+                continue
+            stack.pop()
+            if el.tag in _TITLE_TAGS and stack and stack[-1].tag in _FEED_TAGS:
+                return (el.text or "").strip() or None
+            if el.tag in _ENTRY_TAGS:
+                el.clear()
+    except ET.ParseError:
+        # Malformed XML: feedparser's lenient parser may still recover a title
+        return (_feedparser().parse(bytes(feed_bytes)).feed.get("title") or "").strip() or None
+    return None
+
+
+def _entry_from_feedparser(e) -> dict:
+    return {
+        "guid": stable_guid(e),
+        "legacy_guid": legacy_guid(e),
+        "title": (e.get("title") or "").strip(),
+        "link": e.get("link"),
+        "published": entry_published_ts(e),
+        "content_html": entry_content_html(e),
+    }
+
+
+def iter_feed_entries(payload: bytes, meta: dict, cutoff: int = 0):
+    """Stream entries via parse_feed_stream, falling back to feedparser for markup it can't handle."""
+    try:
+        yield from parse_feed_stream(payload, meta, cutoff)
+        if meta["entries"]:
+            return
+    except Exception:
+        pass
+
+    # Last resort: feedparser copes with broken XML, HTML entities, odd dialects.
+    parsed = _feedparser().parse(payload)
+    if not meta.get("title"):
+        meta["title"] = parsed.feed.get("title")
+    fresh_seen = False
+    stale = 0
+    for e in parsed.entries[meta.get("entries", 0):]:
+        if entry_published_ts(e) < cutoff:
+            stale += 1
+            if fresh_seen and stale >= STALE_STREAK_LIMIT:
+                return
+            continue
+        fresh_seen = True
+        stale = 0
+        yield _entry_from_feedparser(e)
+
+
+def recompute_month_counts(db, cutoff: int):
+    """Recount every feed's entries inside the retention window in one set-based UPDATE."""
+    db.execute(
+        "UPDATE feeds SET month_count = (SELECT COUNT(*) FROM entries WHERE feed_id=feeds.id AND published>=?)",
+        (cutoff,)
+    )
 
 def choose_interval(month_count: int) -> int:
     if month_count <= 10:
@@ -437,37 +949,231 @@ def choose_interval(month_count: int) -> int:
         return INTERVAL_MED
     return INTERVAL_HIGH
 
+# -----------------------
+# Hot-path SQL (constant text so sqlite3's statement cache always hits)
+# -----------------------
+SQL_INSERT_ENTRY = """
+  INSERT OR IGNORE INTO entries(feed_id,guid,title,link,published,content_html,created_at)
+  VALUES(?,?,?,?,?,?,?)
+"""
+# Entries without an id/guid get a hashed key (stable_guid), which moved from sha256 to
+# blake2b; skip those still stored under their old key (UNIQUE(feed_id, guid) lookup).
+SQL_INSERT_ENTRY_HASHED = """
+  INSERT OR IGNORE INTO entries(feed_id,guid,title,link,published,content_html,created_at)
+  SELECT ?,?,?,?,?,?,? WHERE NOT EXISTS (SELECT 1 FROM entries WHERE feed_id=? AND guid=?)
+"""
+# (raw, canonical): rows stored before canonicalization (imports, older versions,
+# feed_update) keep the URL as it was given
+SQL_FEED_BY_URL = "SELECT id, url, title FROM feeds WHERE url IN (?, ?) LIMIT 1"
+SQL_IMPORT_FEED = "INSERT OR IGNORE INTO feeds(url, title) VALUES(?, ?)"
+SQL_MARK_READ = "UPDATE entries SET read_at=? WHERE id=?"
+SQL_TOGGLE_SELECT = "SELECT bookmarked FROM entries WHERE id=?"
+SQL_TOGGLE_UPDATE = "UPDATE entries SET bookmarked=? WHERE id=?"
+
+_ITEMS_WHERE = {
+    "unread": "e.read_at IS NULL AND e.published >= ?",
+    "read": "e.read_at IS NOT NULL AND e.published >= ?",
+    "all": "e.published >= ?",
+    "bookmarked": "e.bookmarked = 1",
+}
+SQL_ITEMS_BY_FILTER = {
+    mode: f"""
+      SELECT e.id, COALESCE(NULLIF(f.title, ''), '(untitled feed)'), COALESCE(f.month_count, 0),
+             COALESCE(NULLIF(e.title, ''), '(no title)'), e.link,
+             COALESCE(e.published, CAST(strftime('%s', 'now') AS INTEGER)),
+             COALESCE(e.content_html, ''), COALESCE(e.bookmarked, 0), e.read_at
+      FROM entries e
+      JOIN feeds f ON f.id = e.feed_id
+      WHERE {where}
+      ORDER BY f.month_count ASC, e.published DESC
+      LIMIT ?
+    """
+    for mode, where in _ITEMS_WHERE.items()
+}
+
 # -----------------------
 # Update core (async)
 # -----------------------
-async def fetch_one(session: aiohttp.ClientSession, sem: asyncio.Semaphore, feed_row):
+# Only advertise brotli when aiohttp has a decoder for it installed
+_ACCEPT_ENCODING = (
+    "gzip, deflate, br"
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi")
+    else "gzip, deflate"
+)
+_RE_MAX_AGE = re.compile(r"max-age\s*=\s*\"?(\d+)", re.I)
+# Don't let a server's Cache-Control push a feed out further than this
+MAX_AGE_CAP = 24 * 3600
+
+def cache_max_age(cache_control: str | None) -> int:
+    """Seconds of freshness promised by a Cache-Control header (0 if none)."""
+    if not cache_control or "no-cache" in cache_control or "no-store" in cache_control:
+        return 0
+    m = _RE_MAX_AGE.search(cache_control)
+    return min(int(m.group(1)), MAX_AGE_CAP) if m else 0
+
+def _use_httpx() -> bool:
+    return HTTP_CLIENT == "httpx" and httpx is not None and importlib.util.find_spec("h2") is not None
+
+def new_http_client():
+    """
+    Client for feed polling. With httpx, HTTP/2 multiplexes requests to shared
+    CDN hosts over one TLS connection; aiohttp is the fallback. Keep-alive and DNS
+    caching are sized for a client that lives across scheduler ticks.
+    """
+    if _use_httpx():
+        return httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=MAX_CONCURRENCY,
+                max_keepalive_connections=MAX_CONCURRENCY,
+                keepalive_expiry=120,
+            ),
+            timeout=httpx.Timeout(25.0),
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+        )
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONCURRENCY, limit_per_host=LIMIT_PER_HOST, ttl_dns_cache=600, keepalive_timeout=120
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+# httpx.Limits has no per-host cap (aiohttp's limit_per_host), so per client, per host
+# semaphores provide one. A client lives on one event loop, so its semaphores do too.
+_HTTPX_HOST_SEMS: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+def _httpx_host_sem(session, url: str) -> asyncio.Semaphore:
+    sems = _HTTPX_HOST_SEMS.setdefault(session, {})
+    host = (urlsplit(url).hostname or "").lower()
+    sem = sems.get(host)
+    if sem is None:
+        sem = sems[host] = asyncio.Semaphore(LIMIT_PER_HOST)
+    return sem
+
+async def _http_get(session, url: str, headers: dict):
+    """GET with either client; returns (status, headers, body). body is None unless status is 200."""
+    if httpx is not None and isinstance(session, httpx.AsyncClient):
+        async with _httpx_host_sem(session, url):
+            # httpx's timeout is per phase; cap the whole request like aiohttp's total=25
+            resp = await asyncio.wait_for(session.get(url, headers=headers), 25)
+        return resp.status_code, resp.headers, (resp.content if resp.status_code == 200 else None)
+    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=25)) as resp:
+        body = await resp.read() if resp.status == 200 else None
+        return resp.status, resp.headers, body
+
+async def fetch_one(session, feed_row):
     feed_id = feed_row["id"]
     url = feed_row["url"]
-    headers = {"User-Agent": USER_AGENT, "Accept": "*/*"}
+    headers = {"User-Agent": USER_AGENT, "Accept": "*/*", "Accept-Encoding": _ACCEPT_ENCODING}
     if feed_row["etag"]:
         headers["If-None-Match"] = feed_row["etag"]
     if feed_row["last_modified"]:
         headers["If-Modified-Since"] = feed_row["last_modified"]
 
-    async with sem:
-        try:
-            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=25)) as resp:
-                status = resp.status
-                if status == 304:
-                    return (feed_id, "not_modified", None, None, None)
-                if status != 200:
-                    return (feed_id, "http_error", status, None, None)
-                text = await resp.text(errors="ignore")
-                etag = resp.headers.get("ETag")
-                last_mod = resp.headers.get("Last-Modified")
-                return (feed_id, "ok", text, etag, last_mod)
-        except Exception as e:
-            return (feed_id, "exception", str(e), None, None)
+    try:
+        # Raw (already decompressed) bytes go straight to the XML parser
+        status, resp_headers, body = await _http_get(session, url, headers)
+        max_age = cache_max_age(resp_headers.get("Cache-Control"))
+        if status == 304:
+            return (feed_id, "not_modified", None, None, None, max_age, None)
+        if status != 200:
+            return (feed_id, "http_error", status, None, None, 0, None)
+        # Many feeds send no validators but serve byte-identical bodies
+        body_sha = hashlib.blake2b(body, digest_size=16).hexdigest()
+        if body_sha == feed_row["body_sha"]:
+            return (feed_id, "not_modified", None, None, None, max_age, body_sha)
+        etag = resp_headers.get("ETag")
+        last_mod = resp_headers.get("Last-Modified")
+        return (feed_id, "ok", body, etag, last_mod, max_age, body_sha)
+    except Exception as e:
+        return (feed_id, "exception", str(e), None, None, 0, None)
+
+# Opt-in: parse feeds in N worker processes so a full sweep isn't bound by the
+# GIL. Off by default (spawned workers re-import app.py, and the frozen desktop
+# build would need multiprocessing.freeze_support()).
+PARSE_PROCESSES = int(os.environ.get("RSS_PARSE_PROCESSES", "0"))
+_PARSE_POOL: concurrent.futures.ProcessPoolExecutor | None = None
 
-async def update_feeds_async(feed_ids=None, only_due=True, progress_cb=None, cancel_event: threading.Event | None = None):
-    # IMPORTANT: callers should hold DB_WRITE_LOCK.
+def _parse_pool() -> concurrent.futures.ProcessPoolExecutor | None:
+    global _PARSE_POOL
+    if PARSE_PROCESSES <= 0:
+        return None
+    if _PARSE_POOL is None:
+        _PARSE_POOL = concurrent.futures.ProcessPoolExecutor(max_workers=min(PARSE_PROCESSES, os.cpu_count() or 1))
+    return _PARSE_POOL
+
+def parse_feed_payload(payload: bytes, cutoff: int) -> tuple[str | None, list[dict]]:
+    """Return (feed_title, entries inside the retention window). Picklable for the process pool."""
+    meta = {}
+    entries = list(iter_feed_entries(payload, meta, cutoff))
+    return (meta.get("title") or "").strip() or None, entries
+
+def _process_feed_payload(db_path: str, feed_row, parsed, etag, last_mod, body_sha, max_age: int,
+                          write_lock=contextlib.nullcontext()) -> tuple[bool, int]:
+    """
+    Store one parsed feed's new entries; returns (added_any, errors).
+    Runs in a worker thread with its own connection (sqlite3 connections aren't
+    shared across threads); DB_WRITE_LOCK is held by the caller or passed as write_lock.
+    """
+    feed_id = feed_row["id"]
+    feed_title, entries = parsed
+    db = _open_db(db_path)
+    try:
+        # `with db` rolls back a failed transaction before the lock is released
+        with write_lock, db:
+            db.execute("BEGIN IMMEDIATE")
+            now = now_ts()
+            rows = []
+            hashed_rows = []
+            for e in entries:
+                row = (feed_id, e["guid"], e["title"], e["link"], e["published"], e["content_html"], now)
+                if e.get("legacy_guid") is None:
+                    rows.append(row)
+                else:
+                    hashed_rows.append(row + (feed_id, e["legacy_guid"]))
+
+            # One executemany per kind; rowcount is the number actually inserted
+            added = 0
+            if rows:
+                added = db.executemany(SQL_INSERT_ENTRY, rows).rowcount
+            if hashed_rows:
+                added += db.executemany(SQL_INSERT_ENTRY_HASHED, hashed_rows).rowcount
+
+            # Every inserted row is inside the retention window, so the new count is the
+            # old one plus the inserts; recompute_month_counts() fixes drift daily.
+            # All of the feed's state goes out in a single UPDATE, guarded by the URL that
+            # was fetched: handlers don't wait for update runs, so the feed may have been
+            # deleted, replaced or re-pointed meanwhile. Then the inserts are rolled back.
+            mc = int(feed_row["month_count"] or 0) + added
+            cur = db.execute(
+                """
+                UPDATE feeds SET title=COALESCE(?, title), etag=?, last_modified=?, body_sha=?,
+                                 last_fetch=?, last_ok=?, fail_count=0, month_count=?, next_fetch=?
+                WHERE id=? AND url=?
+                """,
+                (feed_title, etag, last_mod, body_sha, now, now, mc, now + max(choose_interval(mc), max_age),
+                 feed_id, feed_row["url"])
+            )
+            if cur.rowcount == 0:
+                db.rollback()
+                return False, 0
+            db.commit()
+            return added > 0, 0
+    except Exception:
+        db.rollback()
+        return False, 1
+    finally:
+        db.close()
+
+async def update_feeds_async(feed_ids=None, only_due=True, progress_cb=None, cancel_event: threading.Event | None = None, cutoff: int | None = None, session=None, write_lock=None):
+    # IMPORTANT: callers should hold DB_WRITE_LOCK for the whole run, or pass it as
+    # write_lock to have it taken only around each write (fetching stays unlocked).
+    # session: a long-lived client from new_http_client() (scheduler); otherwise
+    # a client is created for this run and closed at the end.
+    wl = write_lock or contextlib.nullcontext()
     db = connect_db()
-    cutoff = cutoff_ts()
+    db_path = ACTIVE_DB_PATH
+    if cutoff is None:
+        cutoff = cutoff_ts()
 
     if feed_ids:
         q = "SELECT * FROM feeds WHERE id IN (%s)" % ",".join("?" * len(feed_ids))
@@ -488,95 +1194,82 @@ async def update_feeds_async(feed_ids=None, only_due=True, progress_cb=None, can
         db.close()
         return {"checked": 0, "updated": 0, "errors": 0, "total": 0}
 
-    sem = asyncio.Semaphore(MAX_CONCURRENCY)
-    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENCY, limit_per_host=LIMIT_PER_HOST, ttl_dns_cache=300)
-
-    db.execute("BEGIN")
+    feeds_by_id = {f["id"]: f for f in feeds}
     try:
-        async with aiohttp.ClientSession(connector=connector) as session:
-            tasks = []
-            for f in feeds:
-                if cancel_event and cancel_event.is_set():
-                    break
-                tasks.append(asyncio.create_task(fetch_one(session, sem, f)))
-
-            for coro in asyncio.as_completed(tasks):
-                if cancel_event and cancel_event.is_set():
-                    break
-
-                (feed_id, kind, payload, etag, last_mod) = await coro
-                checked += 1
-
-                urow = db.execute("SELECT url FROM feeds WHERE id=?", (feed_id,)).fetchone()
-                cur_url = urow["url"] if urow else None
-
-                try:
-                    if kind == "not_modified":
-                        mcrow = db.execute("SELECT month_count FROM feeds WHERE id=?", (feed_id,)).fetchone()
-                        mc = int(mcrow["month_count"] or 0) if mcrow else 0
-                        db.execute(
-                            "UPDATE feeds SET last_fetch=?, fail_count=0, next_fetch=? WHERE id=?",
-                            (now_ts(), now_ts() + choose_interval(mc), feed_id)
-                        )
-                    elif kind != "ok":
+        async with (contextlib.nullcontext(session) if session is not None else new_http_client()) as session:
+            # Producers fetch into a bounded queue; a single consumer stores results,
+            # parsing off the event loop so fetches keep flowing while a big feed is stored.
+            results_q = asyncio.Queue(maxsize=MAX_CONCURRENCY * 2)
+            pending = iter(feeds)
+
+            async def produce():
+                for f in pending:
+                    if cancel_event and cancel_event.is_set():
+                        return
+                    await results_q.put(await fetch_one(session, f))
+
+            async def close_queue(producers):
+                await asyncio.gather(*producers, return_exceptions=True)
+                await results_q.put(None)
+
+            producers = [asyncio.create_task(produce()) for _ in range(min(MAX_CONCURRENCY, total))]
+            closer = asyncio.create_task(close_queue(producers))
+            try:
+                while True:
+                    result = await results_q.get()
+                    if result is None:
+                        break
+                    if cancel_event and cancel_event.is_set():
+                        break
+
+                    (feed_id, kind, payload, etag, last_mod, max_age, body_sha) = result
+                    feed_row = feeds_by_id[feed_id]
+                    checked += 1
+                    now = now_ts()
+
+                    try:
+                        if kind == "not_modified":
+                            mc = int(feed_row["month_count"] or 0)
+                            with wl:
+                                db.execute(
+                                    "UPDATE feeds SET last_fetch=?, fail_count=0, next_fetch=? WHERE id=? AND url=?",
+                                    (now, now + max(choose_interval(mc), max_age), feed_id, feed_row["url"])
+                                )
+                        elif kind != "ok":
+                            errors += 1
+                            fail = int(feed_row["fail_count"] or 0) + 1
+                            backoff = min(6 * 3600, (2 ** min(fail, 8)) * 60)
+                            with wl:
+                                db.execute(
+                                    "UPDATE feeds SET last_fetch=?, fail_count=?, next_fetch=? WHERE id=? AND url=?",
+                                    (now, fail, now + backoff, feed_id, feed_row["url"])
+                                )
+                        else:
+                            # Parse (thread, or process pool if enabled), then store in a thread.
+                            # Any weird entry dates should not crash the whole job.
+                            parsed = await asyncio.get_running_loop().run_in_executor(
+                                _parse_pool(), parse_feed_payload, payload, cutoff
+                            )
+                            added_any, errs = await asyncio.to_thread(
+                                _process_feed_payload, db_path, feed_row, parsed, etag, last_mod, body_sha, max_age, wl
+                            )
+                            if added_any:
+                                updated += 1
+                            errors += errs
+                    except Exception:
+                        # Treat any per-feed crash as an error, keep going.
                         errors += 1
-                        row = db.execute("SELECT fail_count FROM feeds WHERE id=?", (feed_id,)).fetchone()
-                        fail = int(row["fail_count"] or 0) + 1
-                        backoff = min(6 * 3600, (2 ** min(fail, 8)) * 60)
-                        db.execute(
-                            "UPDATE feeds SET last_fetch=?, fail_count=?, next_fetch=? WHERE id=?",
-                            (now_ts(), fail, now_ts() + backoff, feed_id)
-                        )
-                    else:
-                        # Parse & insert. Any weird entry dates should not crash the whole job.
-                        parsed = feedparser.parse(payload)
-                        feed_title = (parsed.feed.get("title") or "").strip() or None
-                        db.execute(
-                            "UPDATE feeds SET title=COALESCE(?, title), etag=?, last_modified=?, last_fetch=?, last_ok=?, fail_count=0 WHERE id=?",
-                            (feed_title, etag, last_mod, now_ts(), now_ts(), feed_id)
-                        )
-
-                        added_any = False
-                        for e in parsed.entries:
-                            if cancel_event and cancel_event.is_set():
-                                break
-                            try:
-                                guid = stable_guid(e)
-                                title = (e.get("title") or "").strip()
-                                link = e.get("link")
-                                pub_ts = entry_published_ts(e)
-                                if pub_ts < cutoff:
-                                    continue
-                                html = entry_content_html(e)
-                                cur_ins = db.execute("""
-                                  INSERT OR IGNORE INTO entries(feed_id,guid,title,link,published,content_html,created_at)
-                                  VALUES(?,?,?,?,?,?,?)
-                                """, (feed_id, guid, title, link, pub_ts, html, now_ts()))
-                                if cur_ins.rowcount:
-                                    added_any = True
-                            except Exception:
-                                errors += 1
-                                continue
-
-                        if added_any:
-                            updated += 1
-
-                        recompute_month_count(db, feed_id, cutoff)
-                        mcrow = db.execute("SELECT month_count FROM feeds WHERE id=?", (feed_id,)).fetchone()
-                        mc = int(mcrow["month_count"] or 0) if mcrow else 0
-                        db.execute("UPDATE feeds SET next_fetch=? WHERE id=?", (now_ts() + choose_interval(mc), feed_id))
-                except Exception:
-                    # Treat any per-feed crash as an error, keep going.
-                    errors += 1
 
-                if progress_cb:
-                    progress_cb(total=total, checked=checked, updated=updated, errors=errors, state="running", current_url=cur_url)
+                    if progress_cb:
+                        progress_cb(total=total, checked=checked, updated=updated, errors=errors, state="running", current_url=feed_row["url"])
+            finally:
+                for t in producers:
+                    t.cancel()
+                closer.cancel()
+                await asyncio.gather(*producers, closer, return_exceptions=True)
 
-        db.execute("DELETE FROM entries WHERE published < ? AND bookmarked = 0", (cutoff,))
-        db.commit()
-    except Exception:
-        db.rollback()
-        raise
+        with wl:
+            db.execute("DELETE FROM entries WHERE published < ? AND bookmarked = 0", (cutoff,))
     finally:
         db.close()
 
@@ -681,8 +1374,16 @@ def _any_update_job_running() -> bool:
 # Background scheduler
 # -----------------------
 _scheduler_enabled = True
+MONTH_COUNT_SWEEP_SECONDS = 24 * 3600
+# One HTTP client for the scheduler's lifetime: DNS cache, keep-alive sockets and
+# TLS sessions survive from one tick to the next. Bound to the scheduler's loop.
+_HTTP_SESSION = None
 
 async def scheduler_loop():
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        _HTTP_SESSION = new_http_client()
+    last_sweep = 0
     while True:
         await asyncio.sleep(SCHEDULER_TICK_SECONDS)
         if not _scheduler_enabled:
@@ -691,7 +1392,16 @@ async def scheduler_loop():
         if not acquired:
             continue
         try:
-            await update_feeds_async(only_due=True)
+            cutoff = cutoff_ts()
+            await update_feeds_async(only_due=True, cutoff=cutoff, session=_HTTP_SESSION)
+            # month_count is maintained incrementally; resync it once a day
+            if now_ts() - last_sweep >= MONTH_COUNT_SWEEP_SECONDS:
+                db = connect_db()
+                try:
+                    recompute_month_counts(db, cutoff)
+                finally:
+                    db.close()
+                last_sweep = now_ts()
         except Exception:
             pass
         finally:
@@ -716,81 +1426,60 @@ def index():
 def api_items():
     filter_mode = request.args.get("filter", "unread").lower()
     limit = int(request.args.get("limit", "1600"))
-    cutoff = cutoff_ts()
-
-    db = get_db()
-
-    # Build WHERE clause based on filter mode
-    if filter_mode == "read":
-        where_clause = "e.read_at IS NOT NULL AND e.published >= ?"
-        params = (cutoff, limit)
-    elif filter_mode == "bookmarked":
-        where_clause = "e.bookmarked = 1"
-        params = (limit,)
-    elif filter_mode == "all":
-        where_clause = "e.published >= ?"
-        params = (cutoff, limit)
-    else:  # unread (default)
-        where_clause = "e.read_at IS NULL AND e.published >= ?"
-        params = (cutoff, limit)
-
-    query = f"""
-      SELECT e.id, e.title, e.link, e.published, e.content_html, e.bookmarked, e.read_at,
-             f.title AS feed_title, f.month_count
-      FROM entries e
-      JOIN feeds f ON f.id = e.feed_id
-      WHERE {where_clause}
-      ORDER BY f.month_count ASC, e.published DESC
-      LIMIT ?
-    """
-
-    rows = db.execute(query, params).fetchall()
-
-    items = []
-    for r in rows:
-        items.append({
-            "id": r["id"],
-            "feed_title": r["feed_title"] or "(untitled feed)",
-            "month_count": int(r["month_count"] or 0),
-            "title": r["title"] or "(no title)",
-            "link": r["link"],
-            "published": int(r["published"] or now_ts()),
-            "content_html": r["content_html"] or "",
-            "bookmarked": int(r["bookmarked"] or 0),
-            "read_at": r["read_at"],
-        })
-    return jsonify(items)
+    cutoff = g.cutoff
+
+    db = read_db()
+
+    if filter_mode not in SQL_ITEMS_BY_FILTER:
+        filter_mode = "unread"
+    params = (limit,) if filter_mode == "bookmarked" else (cutoff, limit)
+    # Plain tuples (no sqlite3.Row name lookups); defaults are applied in SQL
+    cur = db.cursor()
+    cur.row_factory = None
+    rows = cur.execute(SQL_ITEMS_BY_FILTER[filter_mode], params).fetchall()
+
+    items = [
+        {
+            "id": entry_id,
+            "feed_title": feed_title,
+            "month_count": month_count,
+            "title": title,
+            "link": link,
+            "published": published,
+            "content_html": content_html,
+            "bookmarked": bookmarked,
+            "read_at": read_at,
+        }
+        for (entry_id, feed_title, month_count, title, link, published, content_html, bookmarked, read_at) in rows
+    ]
+    return json_response(items)
 
 @app.route("/api/mark_read", methods=["POST"])
 def api_mark_read():
     entry_id = int(request.json["id"])
-    with DB_WRITE_LOCK:
-        db = get_db()
-        db.execute("UPDATE entries SET read_at=? WHERE id=?", (now_ts(), entry_id))
-        db.commit()
+    with writer() as db:
+        db.execute(SQL_MARK_READ, (now_ts(), entry_id))
     return jsonify({"ok": True})
 
 @app.route("/api/mark_all_read", methods=["POST"])
 def api_mark_all_read():
-    cutoff = cutoff_ts()
-    with DB_WRITE_LOCK:
-        db = get_db()
+    cutoff = g.cutoff
+    with writer() as db:
         db.execute(
             "UPDATE entries SET read_at=? WHERE read_at IS NULL AND published >= ?",
             (now_ts(), cutoff)
         )
-        db.commit()
     return jsonify({"ok": True})
 
 @app.route("/api/toggle_bookmark", methods=["POST"])
 def api_toggle_bookmark():
     entry_id = int(request.json["id"])
-    with DB_WRITE_LOCK:
-        db = get_db()
-        row = db.execute("SELECT bookmarked FROM entries WHERE id=?", (entry_id,)).fetchone()
+    with writer() as db:
+        begin_immediate(db)
+        row = db.execute(SQL_TOGGLE_SELECT, (entry_id,)).fetchone()
         cur = int(row["bookmarked"] or 0)
         new = 0 if cur else 1
-        db.execute("UPDATE entries SET bookmarked=? WHERE id=?", (new, entry_id))
+        db.execute(SQL_TOGGLE_UPDATE, (new, entry_id))
         db.commit()
     return jsonify({"ok": True, "bookmarked": new})
 
@@ -851,7 +1540,7 @@ def api_feeds():
     limit = int(request.args.get("limit") or "200")
     limit = max(1, min(limit, 1000))
 
-    db = get_db()
+    db = read_db()
     if q:
         like = f"%{q}%"
         rows = db.execute(
@@ -869,7 +1558,7 @@ def api_feeds():
 
 @app.route("/api/feed/<int:feed_id>")
 def api_feed_get(feed_id: int):
-    db = get_db()
+    db = read_db()
     r = db.execute("SELECT id, url, title FROM feeds WHERE id=?", (feed_id,)).fetchone()
     if not r:
         return jsonify({"ok": False, "error": "Unknown feed"}), 404
@@ -877,9 +1566,9 @@ def api_feed_get(feed_id: int):
 
 
 def _update_one_feed_now(feed_id: int):
-    # Caller should already hold DB_WRITE_LOCK.
+    # Takes DB_WRITE_LOCK only around its writes, so the caller must NOT hold it.
     try:
-        asyncio.run(update_feeds_async(feed_ids=[feed_id], only_due=False))
+        asyncio.run(update_feeds_async(feed_ids=[feed_id], only_due=False, write_lock=DB_WRITE_LOCK))
     except RuntimeError:
         # If an event loop is already running in this thread (unlikely in Flask), skip.
         pass
@@ -897,39 +1586,37 @@ def api_feed_create():
         return jsonify({"ok": False, "error": "url required"}), 400
 
     try:
-        feed_url, kind = discover_feed_url(input_url)
+        raw_url, kind = discover_feed_url(input_url)
+        # Same feed typed differently (host case, default port, utm_* tags) maps to one row
+        feed_url = canonicalize_url(raw_url)
         feed_bytes, ct = _fetch_url_bytes(feed_url)
         if not _looks_like_feed(ct, feed_bytes):
             return jsonify({"ok": False, "error": "The discovered URL did not look like an RSS/Atom feed."}), 400
-        parsed = feedparser.parse(feed_bytes)
-        title = (parsed.feed.get("title") or "").strip() or None
+        title = _extract_feed_title(feed_bytes)
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 400
 
-    with DB_WRITE_LOCK:
-        db = connect_db()
-        try:
-            existing = db.execute("SELECT id, url, title FROM feeds WHERE url=?", (feed_url,)).fetchone()
-            if existing:
-                feed_id = existing["id"]
-                # Update title if we learned it
-                if title and not existing["title"]:
-                    db.execute("UPDATE feeds SET title=? WHERE id=?", (title, feed_id))
-                    db.commit()
-                out_title = title or existing["title"]
-                out = {"id": feed_id, "url": existing["url"], "title": out_title}
-                return jsonify({"ok": True, "kind": kind, "feed": out, "existing": True})
-
-            cur = db.execute("INSERT INTO feeds(url,title,next_fetch) VALUES(?,?,?)", (feed_url, title, 0))
-            feed_id = cur.lastrowid
+    with writer() as db:
+        begin_immediate(db)
+        existing = db.execute(SQL_FEED_BY_URL, (raw_url, feed_url)).fetchone()
+        if existing:
+            feed_id = existing["id"]
+            # Update title if we learned it
+            if title and not existing["title"]:
+                db.execute("UPDATE feeds SET title=? WHERE id=?", (title, feed_id))
             db.commit()
+            out_title = title or existing["title"]
+            out = {"id": feed_id, "url": existing["url"], "title": out_title}
+            return jsonify({"ok": True, "kind": kind, "feed": out, "existing": True})
 
-            # Fetch immediately so the right pane can refresh with new entries.
-            _update_one_feed_now(feed_id)
-            out = {"id": feed_id, "url": feed_url, "title": title}
-            return jsonify({"ok": True, "kind": kind, "feed": out, "existing": False})
-        finally:
-            db.close()
+        cur = db.execute("INSERT INTO feeds(url,title,next_fetch) VALUES(?,?,?)", (feed_url, title, 0))
+        feed_id = cur.lastrowid
+        db.commit()
+
+    # Fetch immediately (outside the lock) so the right pane can refresh with new entries.
+    _update_one_feed_now(feed_id)
+    out = {"id": feed_id, "url": feed_url, "title": title}
+    return jsonify({"ok": True, "kind": kind, "feed": out, "existing": False})
 
 
 @app.route("/api/feed_update", methods=["POST"])
@@ -946,34 +1633,33 @@ def api_feed_update():
         return jsonify({"ok": False, "error": "id required"}), 400
     if not url:
         return jsonify({"ok": False, "error": "url required"}), 400
-    if not re.match(r"^https?://", url, re.I):
+    if not _valid_http_url(url):
         return jsonify({"ok": False, "error": "URL must start with http:// or https://"}), 400
 
-    with DB_WRITE_LOCK:
-        db = connect_db()
+    with writer() as db:
+        begin_immediate(db)
+        row = db.execute("SELECT id, url, title FROM feeds WHERE id=?", (feed_id,)).fetchone()
+        if not row:
+            db.rollback()
+            return jsonify({"ok": False, "error": "Unknown feed"}), 404
+
         try:
-            row = db.execute("SELECT id, url, title FROM feeds WHERE id=?", (feed_id,)).fetchone()
-            if not row:
-                return jsonify({"ok": False, "error": "Unknown feed"}), 404
+            if url != row["url"]:
+                db.execute(
+                    "UPDATE feeds SET url=?, title=?, etag=NULL, last_modified=NULL, body_sha=NULL, fail_count=0, next_fetch=0 WHERE id=?",
+                    (url, title, feed_id),
+                )
+            else:
+                db.execute("UPDATE feeds SET title=? WHERE id=?", (title, feed_id))
+            db.commit()
+        except sqlite3.IntegrityError:
+            db.rollback()
+            return jsonify({"ok": False, "error": "A feed with that URL already exists."}), 409
 
-            try:
-                if url != row["url"]:
-                    db.execute(
-                        "UPDATE feeds SET url=?, title=?, etag=NULL, last_modified=NULL, fail_count=0, next_fetch=0 WHERE id=?",
-                        (url, title, feed_id),
-                    )
-                else:
-                    db.execute("UPDATE feeds SET title=? WHERE id=?", (title, feed_id))
-                db.commit()
-            except sqlite3.IntegrityError:
-                return jsonify({"ok": False, "error": "A feed with that URL already exists."}), 409
-
-            # Refresh entries after update.
-            _update_one_feed_now(feed_id)
-            out = {"id": feed_id, "url": url, "title": title}
-            return jsonify({"ok": True, "feed": out})
-        finally:
-            db.close()
+    # Refresh entries after update (outside the lock).
+    _update_one_feed_now(feed_id)
+    out = {"id": feed_id, "url": url, "title": title}
+    return jsonify({"ok": True, "feed": out})
 
 
 @app.route("/api/feed_delete", methods=["POST"])
@@ -987,26 +1673,35 @@ def api_feed_delete():
     if not feed_id:
         return jsonify({"ok": False, "error": "id required"}), 400
 
-    with DB_WRITE_LOCK:
-        db = connect_db()
-        try:
-            row = db.execute("SELECT id FROM feeds WHERE id=?", (feed_id,)).fetchone()
-            if not row:
-                return jsonify({"ok": False, "error": "Unknown feed"}), 404
-            db.execute("DELETE FROM entries WHERE feed_id=?", (feed_id,))
-            db.execute("DELETE FROM feeds WHERE id=?", (feed_id,))
-            db.commit()
-        finally:
-            db.close()
+    with writer() as db:
+        begin_immediate(db)
+        # trg_feeds_del_entries removes the feed's entries in the same statement
+        row = db.execute("DELETE FROM feeds WHERE id=? RETURNING id", (feed_id,)).fetchone()
+        if not row:
+            db.rollback()
+            return jsonify({"ok": False, "error": "Unknown feed"}), 404
+        db.commit()
 
     return jsonify({"ok": True})
 
 @app.route("/api/stats")
 def api_stats():
-    db = get_db()
-    feeds = db.execute("SELECT COUNT(*) AS c FROM feeds").fetchone()["c"]
-    unread = db.execute("SELECT COUNT(*) AS c FROM entries WHERE read_at IS NULL AND published >= ?", (cutoff_ts(),)).fetchone()["c"]
-    bookmarked = db.execute("SELECT COUNT(*) AS c FROM entries WHERE bookmarked = 1").fetchone()["c"]
+    db = read_db()
+    try:
+        counts = dict(db.execute("SELECT name, value FROM counters").fetchall())
+        # Unread rows older than the cutoff (mostly bookmarked ones the purge keeps);
+        # a short range scan on idx_entries_unread_pub
+        stale = db.execute(
+            "SELECT COUNT(*) FROM entries WHERE read_at IS NULL AND published < ?", (g.cutoff,)
+        ).fetchone()[0]
+        feeds = counts["feeds"]
+        unread = counts["unread"] - stale
+        bookmarked = counts["bookmarked"]
+    except (sqlite3.OperationalError, KeyError):
+        # DB not migrated yet (reader opened it first): count directly
+        feeds = db.execute("SELECT COUNT(*) AS c FROM feeds").fetchone()["c"]
+        unread = db.execute("SELECT COUNT(*) AS c FROM entries WHERE read_at IS NULL AND published >= ?", (g.cutoff,)).fetchone()["c"]
+        bookmarked = db.execute("SELECT COUNT(*) AS c FROM entries WHERE bookmarked = 1").fetchone()["c"]
     return jsonify({
         "feeds": feeds,
         "unread": unread,
@@ -1048,11 +1743,14 @@ def api_scheduler():
 
 @app.route("/api/opml_export")
 def api_opml_export():
-    db = get_db()
-    feeds = db.execute("SELECT url, title FROM feeds ORDER BY COALESCE(title, url)").fetchall()
-    data = _build_opml([{"url": r["url"], "title": r["title"]} for r in feeds])
+    # Streamed straight off the cursor. The body is iterated after teardown has returned
+    # read_db()'s connection to the pool, so the generator borrows its own.
+    def rows():
+        with reader() as db:
+            yield from db.execute("SELECT url, title FROM feeds ORDER BY COALESCE(title, url)")
+
     return Response(
-        data,
+        _build_opml_stream(rows()),
         mimetype="text/xml",
         headers={"Content-Disposition": "attachment; filename=feeds.opml"},
     )
@@ -1067,7 +1765,7 @@ def api_opml_import():
     new_db_name = (request.form.get("new_db_name") or "").strip()
 
     try:
-        pairs = _parse_opml(f.read())
+        pairs = _parse_opml_cached(f.read())
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 400
 
@@ -1077,98 +1775,68 @@ def api_opml_import():
     imported = 0
     skipped = 0
 
-    # Important: serialize DB writes
-    with DB_WRITE_LOCK:
-        global DB_PATH, DB_PATH_ABS, ACTIVE_DB_PATH
-
-        if mode == "newdb":
-            base_dir = DB_DIR
-            safe_name = _sanitize_db_name(new_db_name)
-            if not safe_name:
-                safe_name = "rss_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".db"
-            new_path = os.path.abspath(os.path.join(base_dir, safe_name))
-            parent = os.path.dirname(new_path)
-            if parent and not os.path.exists(parent):
-                os.makedirs(parent, exist_ok=True)
-            if os.path.exists(new_path):
-                return jsonify({"ok": False, "error": f"DB already exists: {new_path}"}), 400
+    global DB_PATH, DB_PATH_ABS, ACTIVE_DB_PATH
 
-            # Switch the app to this new DB
+    if mode == "newdb":
+        base_dir = DB_DIR
+        safe_name = _sanitize_db_name(new_db_name)
+        if not safe_name:
+            safe_name = "rss_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".db"
+        new_path = os.path.abspath(os.path.join(base_dir, safe_name))
+        parent = os.path.dirname(new_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        # Create, switch to (not mid-update) and init the new DB before touching the shared
+        # writer, so handlers on _WRITER_LOCK never wait out a scheduler tick behind us
+        with DB_WRITE_LOCK:
+            # O_CREAT|O_EXCL: claims the name atomically instead of stat-then-create
+            try:
+                open(new_path, "xb").close()
+            except FileExistsError:
+                return jsonify({"ok": False, "error": f"DB already exists: {new_path}"}), 400
             _set_current_db_abs(new_path)
-
-            # Create schema
             init_db()
 
-            con = connect_db()
-            try:
-                con.execute("BEGIN")
-                for url, title in pairs:
-                    cur = con.execute(
-                        "INSERT OR IGNORE INTO feeds(url, title) VALUES(?, ?)",
-                        (url, title),
-                    )
-                    if cur.rowcount == 1:
-                        imported += 1
-                    else:
-                        skipped += 1
-                con.execute("COMMIT")
-            except Exception:
-                con.execute("ROLLBACK")
-                raise
-            finally:
-                con.close()
-
-            return jsonify({"ok": True, "mode": mode, "imported": imported, "skipped": skipped, "db_path": ACTIVE_DB_PATH})
-
-        # merge/replace operate on current DB
-        con = connect_db()
+    # Import into the current (or just created) DB on the shared writer;
+    # SQLite serializes against the updater
+    with writer() as con:
         try:
-            con.execute("BEGIN")
+            begin_immediate(con)
 
             if mode == "replace":
                 # Replace feed list: clear feeds + entries
                 con.execute("DELETE FROM entries")
                 con.execute("DELETE FROM feeds")
 
-            for url, title in pairs:
-                cur = con.execute(
-                    "INSERT OR IGNORE INTO feeds(url, title) VALUES(?, ?)",
-                    (url, title),
-                )
-                # rowcount is 1 for insert, 0 for ignored
-                if cur.rowcount == 1:
-                    imported += 1
-                else:
-                    skipped += 1
-
+            imported, skipped = import_feed_pairs(con, pairs)
             con.execute("COMMIT")
         except Exception as e:
-            con.execute("ROLLBACK")
+            # begin_immediate may have failed (still locked), leaving nothing to roll back
+            if con.in_transaction:
+                con.execute("ROLLBACK")
             return jsonify({"ok": False, "error": str(e)}), 500
-        finally:
-            con.close()
 
     return jsonify({"ok": True, "mode": mode, "imported": imported, "skipped": skipped, "db_path": ACTIVE_DB_PATH})
 
 def import_feeds_txt(path: str = "feeds.txt"):
-    if not os.path.exists(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
         return 0
+    urls = (u for u in map(str.strip, lines) if u and not u.startswith("#"))
     con = connect_db()
-    n = 0
-    with open(path, "r", encoding="utf-8") as f:
-        con.execute("BEGIN")
+    try:
+        con.execute("BEGIN IMMEDIATE")
         try:
-            for line in f:
-                u = line.strip()
-                if not u or u.startswith("#"):
-                    continue
-                ensure_feed(con, u)
-                n += 1
+            # One executemany; returns how many URLs were new
+            n, _skipped = import_feed_pairs(con, ((u, None) for u in urls))
             con.commit()
         except Exception:
             con.rollback()
             raise
-    con.close()
+    finally:
+        con.close()
     return n
 
 def _is_server_running(host: str, port: int, timeout: float = 0.25) -> bool:
@@ -1226,34 +1894,28 @@ def acquire_single_instance_lock(lockfile: str = ".localrss.lock") -> object | N
 
 def import_default_opml_if_needed(path: str = "feeds.opml") -> int:
     """If the feeds table is empty and an OPML file exists, import it (no duplicates)."""
-    if not os.path.exists(path):
-        return 0
-    con = connect_db()
     try:
-        cur = con.execute("SELECT COUNT(*) FROM feeds")
-        count = int(cur.fetchone()[0] or 0)
-        if count > 0:
-            return 0
-        xml_bytes = open(path, "rb").read()
-        pairs = _parse_opml(xml_bytes)  # list of (url, title)
-        n = 0
-        con.execute("BEGIN")
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return 0
+    with f:
+        con = connect_db()
         try:
-            for url, title in pairs:
-                if not url:
-                    continue
-                con.execute(
-                    "INSERT OR IGNORE INTO feeds(url, title, next_fetch) VALUES(?, ?, 0)",
-                    (url, title or None),
-                )
-                n += 1
-            con.commit()
-        except Exception:
-            con.rollback()
-            raise
-        return n
-    finally:
-        con.close()
+            cur = con.execute("SELECT COUNT(*) FROM feeds")
+            count = int(cur.fetchone()[0] or 0)
+            if count > 0:
+                return 0
+            pairs = _parse_opml(f.read())  # list of (url, title)
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                n, _skipped = import_feed_pairs(con, pairs)
+                con.commit()
+            except Exception:
+                con.rollback()
+                raise
+            return n
+        finally:
+            con.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,78 @@
+"""
+Small per-entry/per-URL helpers for LocalRSSReader's ingest paths.
+
+Plain Python that Cython can compile unchanged (`cythonize -i fastpath.py`); an
+extension module built next to this file is picked up by the normal import in
+preference to the .py, so nothing else changes.
+"""
+import calendar
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(u: str) -> str:
+    """
+    Normalize a feed URL for duplicate detection: lowercase scheme and host, drop
+    default ports, utm_* tracking parameters and the fragment. Path case is kept.
+    """
+    parts = urlsplit(u.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if not netloc:
+        return u.strip()
+    if ":" in netloc:
+        netloc = f"[{netloc}]"  # IPv6 literal
+    if parts.username is not None:
+        auth = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        netloc = f"{auth}@{netloc}"
+    try:
+        port = parts.port
+    except ValueError:
+        return u.strip()
+    if port is not None and port != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    query = parts.query
+    if "utm_" in query.lower():
+        # Drop just those segments; the rest stays byte-for-byte (no re-encoding)
+        query = "&".join(seg for seg in query.split("&") if seg[:4].lower() != "utm_")
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+# "Mon, 06 Sep 2021 16:45:00 +0000" and its usual variants (no weekday, no seconds,
+# "GMT"/"UT"/"Z" instead of an offset)
+_RE_RFC822 = re.compile(
+    r"\s*(?:[A-Za-z]{3},?\s*)?(\d{1,2})\s+([A-Za-z]{3})\s+(\d{4})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?"
+    r"\s*(?:([+-])(\d{2}):?(\d{2})|GMT|UTC?|Z)\s*$"
+)
+_MONTHS = {m: i for i, m in enumerate(("jan", "feb", "mar", "apr", "may", "jun",
+                                       "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+_MDAYS = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def parse_rfc822(s: str, max_year: int = 9999) -> int | None:
+    """
+    Epoch seconds for the common RFC 822 date shapes, or None for anything else
+    (other zones, two-digit or out-of-range years, invalid fields) so the caller
+    can fall back to a general parser.
+    """
+    m = _RE_RFC822.match(s)
+    if m is None:
+        return None
+    day, mon, year, hh, mi, ss, sign, oh, om = m.groups()
+    month = _MONTHS.get(mon.lower())
+    y = int(year)
+    d = int(day)
+    if month is None or y < 1971 or y > max_year or d < 1 or d > _MDAYS[month]:
+        return None
+    if month == 2 and d == 29 and not calendar.isleap(y):
+        return None
+    h, mn, sec = int(hh), int(mi), int(ss or 0)
+    if h > 23 or mn > 59 or sec > 59:
+        return None
+    ts = calendar.timegm((y, month, d, h, mn, sec, 0, 0, 0))
+    if sign:
+        offset = int(oh) * 3600 + int(om) * 60
+        ts = ts - offset if sign == "+" else ts + offset
+    return ts
@@ -8,12 +8,19 @@ a = Analysis(
     binaries=[],
     datas=[
         ('app.py', '.'),
+        ('fastpath.py', '.'),
+        ('opml_parser.py', '.'),
         ('static', 'static'),
         ('feeds.opml', '.'),
     ],
     hiddenimports=[
         'flask',
         'aiohttp',
+        'httpx',
+        'h2',
+        'orjson',
+        'fastpath',
+        'opml_parser',
         'feedparser',
         'pystray',
         'PIL',
@@ -0,0 +1,36 @@
+"""
+OPML outline extraction for LocalRSSReader.
+
+Kept free of app/Flask imports so it can be compiled on its own (Cython/mypyc)
+without touching app.py; the plain-Python module is the default.
+"""
+import io
+import xml.etree.ElementTree as ET
+
+
+def _parse_opml(xml_bytes: bytes) -> list:
+    """Return list of (url, title) from an OPML file, in document order, without duplicates."""
+    pairs: list = []
+    seen: set = set()
+    try:
+        # Streamed: attributes are read on "start", finished outlines are cleared on "end"
+        # so large exports don't keep a full tree of attribute dicts in memory.
+        for event, el in ET.iterparse(io.BytesIO(xml_bytes), events=("start", "end")):
+            if el.tag != "outline":
+                continue
+            if event == "end":
+                el.clear()
+                continue
+            attrib = el.attrib
+            url = attrib.get("xmlUrl") or attrib.get("xmlurl") or attrib.get("url")
+            if not url:
+                continue
+            url = url.strip()
+            if not url or url in seen:
+                continue
+            title = (attrib.get("title") or attrib.get("text") or "").strip() or None
+            pairs.append((url, title))
+            seen.add(url)
+    except ET.ParseError as e:
+        raise ValueError(f"Invalid OPML/XML: {e}")
+    return pairs
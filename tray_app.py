@@ -3,7 +3,13 @@
 LocalRSS Reader - System Tray Application
 Runs Flask server in background with database sync capabilities
 """
+import base64
+import io
 import os
+import shlex
+import shutil
+import socket
+import sqlite3
 import sys
 import threading
 import webbrowser
@@ -12,17 +18,25 @@ import time
 from pathlib import Path
 import json
 
-# GUI imports
-try:
-    import pystray
-    from pystray import MenuItem as item
-    from PIL import Image, ImageDraw
-except ImportError:
-    print("Installing required packages...")
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "pystray", "Pillow"])
-    import pystray
-    from pystray import MenuItem as item
-    from PIL import Image, ImageDraw
+# GUI modules, imported by load_gui() when the tray actually starts
+pystray = item = Image = None
+
+
+def load_gui():
+    """Import pystray/Pillow on first use, installing them if missing"""
+    global pystray, item, Image
+    if pystray is not None:
+        return
+    try:
+        import pystray
+        from pystray import MenuItem as item
+        from PIL import Image
+    except ImportError:
+        print("Installing required packages...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "pystray", "Pillow"])
+        import pystray
+        from pystray import MenuItem as item
+        from PIL import Image
 
 # Get the directory where this script is located
 if getattr(sys, 'frozen', False):
@@ -38,6 +52,17 @@ else:
 CONFIG_DIR.mkdir(exist_ok=True)
 CONFIG_FILE = CONFIG_DIR / "config.json"
 
+# 64x64 RSS tray icon, pre-rendered (orange dot + two arcs on white) so startup
+# doesn't need ImageDraw
+_ICON_PNG = base64.b64decode(
+    """
+    iVBORw0KGgoAAAANSUhEUgAAAEAAAABACAIAAAAlC+aJAAAAl0lEQVR42u3YwQnAIAwAQPffo3Pa
+    AdpaH2oSOPEpJIegSVovvhoAAAAAAAAAAAAAAAAAAAAAAABA71dbsGsDyt8AAABAZcC5f2DJew+Q
+    DHC0lABYkn0awPZq9BkjR/YTgK9gNQCDeDmyDwVs78jGsXNkH3QD53ri5YCApn7+Ffo1R04lXv+B
+    yZPmQgAAAAAAAAAAAABZ1w3ZH90zKx7HeQAAAABJRU5ErkJggg==
+    """
+)
+
 # Default configuration
 DEFAULT_CONFIG = {
     "vps_host": "158.69.209.43",
@@ -49,6 +74,39 @@ DEFAULT_CONFIG = {
 }
 
 
+def wait_for_server(host, port, timeout=5.0):
+    """Poll until something accepts connections on host:port; False on timeout"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.05):
+                return True
+        except OSError:
+            time.sleep(0.02)
+    return False
+
+
+# Run on the VPS to take a consistent (WAL-aware) snapshot with SQLite's backup API;
+# python3 is always there, the sqlite3 CLI often isn't
+_REMOTE_BACKUP_PY = (
+    "import sqlite3,sys; s=sqlite3.connect(sys.argv[1]); d=sqlite3.connect(sys.argv[2]); "
+    "s.backup(d); d.close(); s.close()"
+)
+
+
+def sqlite_backup(src_path, dst_path):
+    """Copy a SQLite DB that may be open/in WAL mode, via the backup API"""
+    src = sqlite3.connect(src_path)
+    try:
+        dst = sqlite3.connect(dst_path)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+    finally:
+        src.close()
+
+
 def load_config():
     """Load configuration from file or create default"""
     if CONFIG_FILE.exists():
@@ -80,17 +138,9 @@ class LocalRSSApp:
         db_path.parent.mkdir(parents=True, exist_ok=True)
 
     def create_icon(self):
-        """Create a simple RSS icon"""
-        # Create a 64x64 image with RSS symbol
-        img = Image.new('RGB', (64, 64), color='white')
-        draw = ImageDraw.Draw(img)
-
-        # Draw RSS symbol (simplified)
-        draw.ellipse([8, 40, 16, 48], fill='orange')
-        draw.pieslice([4, 20, 32, 48], 0, 90, fill='orange')
-        draw.pieslice([4, 4, 48, 48], 0, 90, fill='orange')
-
-        return img
+        """Load the embedded RSS icon"""
+        load_gui()
+        return Image.open(io.BytesIO(_ICON_PNG))
 
     def start_flask(self):
         """Start Flask server in background thread"""
@@ -116,8 +166,9 @@ class LocalRSSApp:
         self.flask_thread.start()
         self.running = True
 
-        # Wait a moment for Flask to start
-        time.sleep(2)
+        # Wait until Flask is accepting connections (not a fixed delay)
+        if not wait_for_server('127.0.0.1', self.port):
+            print("Flask did not start listening within 5 seconds")
 
     def open_browser(self, icon=None, item=None):
         """Open the RSS reader in default browser"""
@@ -125,21 +176,42 @@ class LocalRSSApp:
             self.start_flask()
         webbrowser.open(f'http://127.0.0.1:{self.port}')
 
+    def _remote(self, path=None):
+        host = f"{self.config['vps_user']}@{self.config['vps_host']}"
+        return f"{host}:{path}" if path else host
+
+    def _ssh(self, command):
+        return subprocess.run(['ssh', self._remote(), command], capture_output=True, text=True, timeout=30)
+
+    def _copy(self, src, dst):
+        """rsync delta transfer into dst when available (only changed blocks move), else scp"""
+        # Not on Windows: rsync reads a local "C:\..." path as a remote host "C:"
+        if os.name != 'nt' and shutil.which('rsync'):
+            cmd = ['rsync', '-z', '--inplace', '--partial', src, dst]
+        else:
+            cmd = ['scp', src, dst]
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+
     def sync_from_vps(self, icon=None, item=None):
         """Download database from VPS"""
+        vps_db = self.config['vps_db_path']
+        vps_snap = vps_db + '.sync'
+        local_db = self.config['local_db_path']
+        # Kept between syncs as rsync's basis, so repeat downloads only move changed blocks
+        local_snap = local_db + '.sync'
         try:
             if icon:
                 icon.notify("Syncing from VPS...", "LocalRSS Reader")
 
-            cmd = [
-                'scp',
-                f"{self.config['vps_user']}@{self.config['vps_host']}:{self.config['vps_db_path']}",
-                self.config['local_db_path']
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            # Snapshot on the VPS (the live file may have un-checkpointed WAL frames)
+            result = self._ssh(f"python3 -c {shlex.quote(_REMOTE_BACKUP_PY)} {shlex.quote(vps_db)} {shlex.quote(vps_snap)}")
+            # No usable python3 there: copy the live file, as plain scp always did
+            src = vps_snap if result.returncode == 0 else vps_db
+            result = self._copy(self._remote(src), local_snap)
 
             if result.returncode == 0:
+                # Backup API into the local DB: safe even if the local server has it open
+                sqlite_backup(local_snap, local_db)
                 if icon:
                     icon.notify("Sync complete!", "Database downloaded from VPS")
             else:
@@ -154,27 +226,30 @@ class LocalRSSApp:
 
     def sync_to_vps(self, icon=None, item=None):
         """Upload database to VPS"""
+        vps_db = self.config['vps_db_path']
+        vps_snap = vps_db + '.sync'
+        local_snap = self.config['local_db_path'] + '.sync'
         try:
             if icon:
                 icon.notify("Uploading to VPS...", "LocalRSS Reader")
 
-            cmd = [
-                'scp',
-                self.config['local_db_path'],
-                f"{self.config['vps_user']}@{self.config['vps_host']}:{self.config['vps_db_path']}"
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            # Consistent local snapshot, then seed the remote copy with the current DB so
+            # rsync only sends the blocks that differ
+            sqlite_backup(self.config['local_db_path'], local_snap)
+            self._ssh(f"cp -f {shlex.quote(vps_db)} {shlex.quote(vps_snap)}")
+            result = self._copy(local_snap, self._remote(vps_snap))
 
             if result.returncode == 0:
-                # Restart the Docker container on VPS
-                restart_cmd = [
-                    'ssh',
-                    f"{self.config['vps_user']}@{self.config['vps_host']}",
-                    'cd /srv/apps/localrss_reader && docker compose restart'
-                ]
-                subprocess.run(restart_cmd, capture_output=True, timeout=30)
+                # Swap the file in with the container stopped, dropping the old DB's WAL/SHM,
+                # then start it again; the exit status is the swap's (or start's) failure
+                result = self._ssh(
+                    'cd /srv/apps/localrss_reader || exit 1; docker compose stop'
+                    f' && mv -f {shlex.quote(vps_snap)} {shlex.quote(vps_db)}'
+                    f' && rm -f {shlex.quote(vps_db + "-wal")} {shlex.quote(vps_db + "-shm")}'
+                    '; rc=$?; docker compose start || rc=$?; exit $rc'
+                )
 
+            if result.returncode == 0:
                 if icon:
                     icon.notify("Upload complete!", "Database uploaded to VPS")
             else:
@@ -204,6 +279,7 @@ class LocalRSSApp:
         self.start_flask()
 
         # Create system tray icon
+        load_gui()
         icon = pystray.Icon(
             "localrss",
             self.create_icon(),
@@ -217,8 +293,7 @@ class LocalRSSApp:
             )
         )
 
-        # Auto-open browser on start
-        time.sleep(1)
+        # Auto-open browser on start (start_flask already waited for the server)
         self.open_browser()
 
         # Run the icon (this blocks)